@@ -1,10 +1,15 @@
 """A bunch of analysis scripts."""
 
-import glob
+import concurrent.futures
+import copy
+import functools
+import mmap
+import multiprocessing
 import os
 import pickle
 import sys
-from typing import Any, Dict, Optional, Sequence, Tuple
+import threading
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence, Set, Tuple
 import os
 
 import haiku as hk
@@ -19,40 +24,70 @@ import numpy as np
 import pandas as pd
 import yaml
 from absl import logging
-from clu import checkpoint
+import flax.serialization
 from flax.training import train_state
 
 sys.path.append("..")
 
 from symphony.data.datasets import qm9
+from symphony.data.datasets import utils as dataset_utils
+from symphony import datatypes
 from symphony import models
-from symphony import train
 from configs import root_dirs
 
-try:
-    from symphony.data import input_pipeline_tf
-    import tensorflow as tf
+# Reuse compiled XLA programs across analysis runs, if a cache directory is provided.
+if os.environ.get("SYMPHONY_XLA_CACHE_DIR"):
+    jax.config.update(
+        "jax_compilation_cache_dir",
+        os.path.expanduser(os.environ["SYMPHONY_XLA_CACHE_DIR"]),
+    )
 
-    tf.config.experimental.set_visible_devices([], "GPU")
-except ImportError:
-    logging.warning("TensorFlow not installed")
 
+# Guards _hide_gpus_from_tf(), which may be called from several loading threads at once.
+_TF_DEVICES_LOCK = threading.Lock()
+_TF_GPUS_HIDDEN = False
 
-def cast_keys_as_int(dictionary: Dict[Any, Any]) -> Dict[Any, Any]:
-    """Returns a dictionary with string keys converted to integers, wherever possible."""
-    casted_dictionary = {}
-    for key, val in dictionary.items():
-        try:
-            val = cast_keys_as_int(val)
-        except AttributeError:
-            pass
 
+def _hide_gpus_from_tf() -> None:
+    """Hides the GPUs from TensorFlow, so that it does not take GPU memory away from JAX.
+
+    This must be called before anything that imports TensorFlow initializes its devices.
+    """
+    global _TF_GPUS_HIDDEN
+    with _TF_DEVICES_LOCK:
+        if _TF_GPUS_HIDDEN:
+            return
+        import tensorflow as tf
+
+        tf.config.experimental.set_visible_devices([], "GPU")
+        _TF_GPUS_HIDDEN = True
+
+
+@functools.lru_cache(maxsize=None)
+def _cast_key_as_int(key: Any) -> Any:
+    """Returns the key converted to an integer if it is an integer string, else the key itself."""
+    if isinstance(key, str):
+        # This is memoized, so the exception is raised at most once per distinct key.
         try:
-            key = int(key)
+            return int(key)
         except ValueError:
             pass
-        finally:
-            casted_dictionary[key] = val
+    return key
+
+
+def cast_keys_as_int(dictionary: Dict[Any, Any]) -> Dict[Any, Any]:
+    """Returns a dictionary with string keys converted to integers, wherever possible."""
+    casted_dictionary = {}
+    stack = [(dictionary, casted_dictionary)]
+    while stack:
+        source, target = stack.pop()
+        for key, val in source.items():
+            key = _cast_key_as_int(key)
+            if isinstance(val, dict):
+                target[key] = {}
+                stack.append((val, target[key]))
+            else:
+                target[key] = val
     return casted_dictionary
 
 
@@ -64,8 +99,8 @@ def name_from_workdir(workdir: str) -> str:
     return workdir[index:]
 
 
-def config_to_dataframe(config: ml_collections.ConfigDict) -> Dict[str, Any]:
-    """Flattens a nested config into a Pandas dataframe."""
+def config_to_dict(config: ml_collections.ConfigDict) -> Dict[str, Any]:
+    """Flattens a nested config into a dictionary with prefixed keys."""
 
     # Compatibility with old configs.
     if "num_interactions" not in config:
@@ -85,8 +120,133 @@ def config_to_dataframe(config: ml_collections.ConfigDict) -> Dict[str, Any]:
             else:
                 yield prefix + k, v
 
-    config_dict = dict(iterate_with_prefix(config.to_dict(), "config."))
-    return pd.DataFrame().from_dict([config_dict])
+    return dict(iterate_with_prefix(config.to_dict(), "config."))
+
+
+def config_to_dataframe(config: ml_collections.ConfigDict) -> pd.DataFrame:
+    """Flattens a nested config into a Pandas dataframe."""
+    return pd.DataFrame().from_dict([config_to_dict(config)])
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_config_yml(config_path: str, mtime: float) -> Any:
+    """Parses a config.yml file, using the C loaders from libyaml if available."""
+    del mtime  # Only used as part of the cache key.
+    with open(config_path, "rb") as config_file:
+        contents = config_file.read()
+
+    try:
+        return yaml.load(contents, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+    except yaml.constructor.ConstructorError:
+        # Older configs were saved as pickled ConfigDicts, which need the unsafe loader.
+        return yaml.load(
+            contents, Loader=getattr(yaml, "CUnsafeLoader", yaml.UnsafeLoader)
+        )
+
+
+def _load_config_yml(config_path: str) -> Any:
+    """Returns the contents of a config.yml file, parsing it again only if it was modified."""
+    config = _parse_config_yml(config_path, os.path.getmtime(config_path))
+    return copy.deepcopy(config)
+
+
+@functools.lru_cache(maxsize=32)
+def _cached_model(
+    workdir: str, run_in_evaluation_mode: bool, mtime: float
+) -> Tuple[hk.Transformed, ml_collections.ConfigDict]:
+    """Returns the model and config for a workdir, constructing them again only if config.yml was modified."""
+    del mtime  # Only used as part of the cache key.
+    config = _load_config_yml(os.path.join(workdir, "config.yml"))
+    assert config is not None
+    config = ml_collections.ConfigDict(config)
+    config.root_dir = root_dirs.get_root_dir(config.dataset)
+
+    model = models.create_model(config, run_in_evaluation_mode=run_in_evaluation_mode)
+    return model, config
+
+
+# Used to overlap file reads with other work.
+_IO_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=8)
+
+# Used by load_from_workdir_async(). This is separate from _IO_EXECUTOR,
+# since load_from_workdir() itself waits on reads submitted to _IO_EXECUTOR.
+_LOAD_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+
+
+def _restore_checkpoint(workdir: str, target: Dict[str, Any]) -> Dict[str, Any]:
+    """Restores the entries of target from the latest checkpoint in the workdir."""
+    # clu.checkpoint pulls in TensorFlow, so we only import it when needed.
+    _hide_gpus_from_tf()
+    from clu import checkpoint
+
+    checkpoint_dir = os.path.join(workdir, "checkpoints")
+    ckpt = checkpoint.Checkpoint(checkpoint_dir, max_to_keep=5)
+    return ckpt.restore(target)
+
+
+def _device_put_tree(tree: Any) -> Any:
+    """Moves all host leaves of a pytree to the device in one transfer, rather than one at a time."""
+    leaves, treedef = jax.tree_util.tree_flatten(tree)
+    # Leaves already on the device don't need to be transferred again.
+    host_indices = [
+        index
+        for index, leaf in enumerate(leaves)
+        if isinstance(leaf, (np.ndarray, np.generic))
+    ]
+    device_leaves = jax.device_put([leaves[index] for index in host_indices])
+    for index, leaf in zip(host_indices, device_leaves):
+        leaves[index] = leaf
+    return jax.tree_util.tree_unflatten(treedef, leaves)
+
+
+def _read_params(workdir: str, step: str) -> optax.Params:
+    """Reads the saved parameters at a given step, preferring msgpack over pickle if available."""
+    msgpack_file = os.path.join(workdir, f"checkpoints/params_{step}.msgpack")
+    params_file = os.path.join(workdir, f"checkpoints/params_{step}.pkl")
+    # The msgpack copy is written after the pickle, so an older one is left over from a previous run.
+    if os.path.exists(msgpack_file) and (
+        not os.path.exists(params_file)
+        or os.path.getmtime(msgpack_file) >= os.path.getmtime(params_file)
+    ):
+        # Decode directly from the mapped pages, instead of first reading the whole file into memory.
+        with open(msgpack_file, "rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mapped_file:
+            return flax.serialization.msgpack_restore(mapped_file)
+
+    with open(params_file, "rb") as f:
+        return pickle.load(f)
+
+
+def _params_mtimes(workdir: str, step: str) -> Tuple[Optional[float], ...]:
+    """Returns the modification times of the saved parameter files at a given step, or None for missing files."""
+    return tuple(
+        os.path.getmtime(path) if os.path.exists(path) else None
+        for path in (
+            os.path.join(workdir, f"checkpoints/params_{step}.msgpack"),
+            os.path.join(workdir, f"checkpoints/params_{step}.pkl"),
+        )
+    )
+
+
+@functools.lru_cache(maxsize=4)
+def _read_params_cached(
+    workdir: str, step: str, mtimes: Tuple[Optional[float], ...]
+) -> optax.Params:
+    """Returns the saved parameters at a given step as host arrays, reading them again only if they were modified."""
+    del mtimes  # Only used as part of the cache key.
+    return jax.tree_util.tree_map(np.asarray, _read_params(workdir, step))
+
+
+def _load_params(workdir: str, step: str) -> optax.Params:
+    """Returns a copy of the saved parameters at a given step, placed on the device.
+
+    Only the host arrays are cached, so cached checkpoints do not hold on to device memory.
+    The cache is keyed on the file modification times, since params_best is overwritten during training.
+    """
+    return _device_put_tree(
+        _read_params_cached(workdir, step, _params_mtimes(workdir, step))
+    )
 
 
 def load_model_at_step(
@@ -95,99 +255,146 @@ def load_model_at_step(
     """Loads the model at a given step.
 
     This is a lightweight version of load_from_workdir, that only constructs the model and not the training state.
+    Models and the host copies of parameters are cached, so repeated calls for the same workdir are cheap.
     """
-    params_file = os.path.join(workdir, f"checkpoints/params_{step}.pkl")
-    with open(params_file, "rb") as f:
-        params = pickle.load(f)
-
-    with open(workdir + "/config.yml", "rt") as config_file:
-        config = yaml.unsafe_load(config_file)
-    assert config is not None
-    config = ml_collections.ConfigDict(config)
-    config.root_dir = root_dirs.get_root_dir(
-        config.dataset
+    params = _load_params(workdir, step)
+    model, config = _cached_model(
+        workdir,
+        run_in_evaluation_mode,
+        os.path.getmtime(os.path.join(workdir, "config.yml")),
     )
-
-    model = models.create_model(config, run_in_evaluation_mode=run_in_evaluation_mode)
-    params = jax.tree_util.tree_map(jnp.asarray, params)
-    return model, params, config
+    return model, params, config.copy_and_resolve_references()
 
 
 def load_weighted_average_model_at_steps(
     workdir: str, steps: Sequence[str], run_in_evaluation_mode: bool
 ) -> Tuple[hk.Transformed, optax.Params, ml_collections.ConfigDict]:
     """Loads the model at given steps, and takes an equal average of the parameters."""
-    for index, step in enumerate(steps):
-        params_file = os.path.join(workdir, f"checkpoints/params_{step}.pkl")
-        with open(params_file, "rb") as f:
-            params = pickle.load(f)
-        
+    # Read the params for all steps concurrently, while summing up the ones already read.
+    all_params = _IO_EXECUTOR.map(functools.partial(_read_params, workdir), steps)
+    for index, params in enumerate(all_params):
         if index == 0:
             params_avg = params
         else:
             params_avg = jax.tree_util.tree_map(lambda x, y: x + y, params_avg, params)
     params_avg = jax.tree_util.tree_map(lambda x: x / len(steps), params_avg)
 
-    with open(workdir + "/config.yml", "rt") as config_file:
-        config = yaml.unsafe_load(config_file)
+    config = _load_config_yml(os.path.join(workdir, "config.yml"))
     assert config is not None
     config = ml_collections.ConfigDict(config)
-    if 'max_targets_per_graph' in config:
-        config.root_dir = root_dirs.get_root_dir(
-            config.dataset, config.get("fragment_logic", "nn"), config.max_targets_per_graph
-        )
-    else:
-        config.root_dir = root_dirs.get_root_dir(
-            config.dataset, config.get("fragment_logic", "nn")
-        )
+    config.root_dir = root_dirs.get_root_dir(config.dataset)
 
     model = models.create_model(config, run_in_evaluation_mode=run_in_evaluation_mode)
-    params_avg = jax.tree_util.tree_map(jnp.asarray, params_avg)
+    params_avg = _device_put_tree(params_avg)
     return model, params_avg, config
 
 
 
-def get_results_as_dataframe(basedir: str) -> pd.DataFrame:
-    """Returns the results for the given model as a pandas dataframe."""
+def _init_worker() -> None:
+    """Restricts worker processes to the CPU, so that they do not contend for the GPU."""
+    os.environ["XLA_PYTHON_CLIENT_PREALLOCATE"] = "false"
+    os.environ["JAX_PLATFORMS"] = "cpu"
+    jax.config.update("jax_platforms", "cpu")
 
-    results = pd.DataFrame()
-    for config_file_path in glob.glob(
-        os.path.join(basedir, "**", "*.yml"), recursive=True
-    ):
-        workdir = os.path.dirname(config_file_path)
-        try:
-            config, best_state, _, metrics_for_best_state = load_from_workdir(workdir)
-        except FileNotFoundError:
-            logging.warning(f"Skipping {workdir} because it is incomplete.")
-            continue
 
-        num_params = sum(
-            jax.tree_util.tree_leaves(jax.tree_util.tree_map(jnp.size, best_state.params))
+def _load_one(workdir: str) -> Optional[Dict[str, Any]]:
+    """Returns the results for a single workdir as a flat dictionary, or None if it is incomplete."""
+    try:
+        config, _, best_state, metrics_for_best_state = load_from_workdir(
+            workdir, eval_only=True
         )
-        config_df = config_to_dataframe(config)
-        other_df = pd.DataFrame.from_dict(
+    except FileNotFoundError:
+        logging.warning(f"Skipping {workdir} because it is incomplete.")
+        return None
+
+    num_params = sum(
+        jax.tree_util.tree_leaves(jax.tree_util.tree_map(jnp.size, best_state.params))
+    )
+    row = config_to_dict(config)
+    row.update(
+        {
+            "model": config.model.lower(),
+            "max_l": config.max_ell,
+            "num_interactions": config.num_interactions,
+            "num_channels": config.num_channels,
+            "num_params": num_params,
+            # "num_train_molecules": (
+            #     config.train_molecules[1] - config.train_molecules[0]
+            # ),
+        }
+    )
+    for split in metrics_for_best_state:
+        row.update(
             {
-                "model": [config.model.lower()],
-                "max_l": [config.max_ell],
-                "num_interactions": [config.num_interactions],
-                "num_channels": [config.num_channels],
-                "num_params": [num_params],
-                # "num_train_molecules": [
-                #     config.train_molecules[1] - config.train_molecules[0]
-                # ],
-            }
-        )
-        df = pd.merge(config_df, other_df, left_index=True, right_index=True)
-        for split in metrics_for_best_state:
-            metrics_for_split = {
-                f"{split}.{metric}": [metrics_for_best_state[split][metric].item()]
+                f"{split}.{metric}": metrics_for_best_state[split][metric].item()
                 for metric in metrics_for_best_state[split]
             }
-            metrics_df = pd.DataFrame.from_dict(metrics_for_split)
-            df = pd.merge(df, metrics_df, left_index=True, right_index=True)
-        results = pd.concat([results, df], ignore_index=True)
+        )
+    return row
+
+
+def _find_config_files(
+    basedir: str, visited: Optional[Set[Tuple[int, int]]] = None
+) -> Iterator[str]:
+    """Yields the paths of all .yml files under basedir, like a recursive glob.
+
+    As with glob, hidden entries are skipped and symlinked directories are followed.
+    Each directory is visited only once, so symlink cycles do not recurse forever.
+    """
+    if visited is None:
+        visited = set()
+
+    try:
+        stat = os.stat(basedir)
+        entries = os.scandir(basedir)
+    except OSError:
+        # Like glob, missing or unreadable directories yield nothing.
+        return
+
+    with entries:
+        if (stat.st_dev, stat.st_ino) in visited:
+            return
+        visited.add((stat.st_dev, stat.st_ino))
+
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir():
+                yield from _find_config_files(entry.path, visited)
+            elif entry.name.endswith(".yml"):
+                yield entry.path
+
+
+# The default number of worker processes used by get_results_as_dataframe().
+_MAX_DEFAULT_WORKERS = 8
+
+
+def get_results_as_dataframe(
+    basedir: str, max_workers: Optional[int] = None
+) -> pd.DataFrame:
+    """Returns the results for the given model as a pandas dataframe."""
+    workdirs = [
+        os.path.dirname(config_file_path)
+        for config_file_path in _find_config_files(basedir)
+    ]
 
-    return results
+    if not workdirs:
+        return pd.DataFrame()
+
+    # Each worker imports JAX and TensorFlow, and the loading is mostly I/O,
+    # so by default we only start a few of them.
+    if max_workers is None:
+        max_workers = min(_MAX_DEFAULT_WORKERS, os.cpu_count() or 1, len(workdirs))
+
+    # Each workdir is loaded independently, so we can load them in parallel.
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+    ) as executor:
+        rows = [row for row in executor.map(_load_one, workdirs) if row is not None]
+
+    return pd.DataFrame(rows)
 
 
 def load_metrics_from_workdir(
@@ -209,34 +416,141 @@ def load_metrics_from_workdir(
         raise FileNotFoundError(f"No saved config found at {workdir}")
 
     logging.info("Saved config found at %s", saved_config_path)
-    with open(saved_config_path, "r") as config_file:
-        config = yaml.unsafe_load(config_file)
+    config = _load_config_yml(saved_config_path)
 
     # Check that the config was loaded correctly.
     assert config is not None
     config = ml_collections.ConfigDict(config)
-    config.root_dir = root_dirs.get_root_dir(
-        config.dataset, config.get("fragment_logic", "nn"), config.max_targets_per_graph
-    )
+    config.root_dir = root_dirs.get_root_dir(config.dataset)
 
-    checkpoint_dir = os.path.join(workdir, "checkpoints")
-    ckpt = checkpoint.Checkpoint(checkpoint_dir, max_to_keep=5)
-    data = ckpt.restore({"metrics_for_best_state": None})
+    data = _restore_checkpoint(workdir, {"metrics_for_best_state": None})
 
     return config, cast_keys_as_int(data["metrics_for_best_state"])
 
 
+# Jitted model functions, keyed by the spec of the model they were created from.
+_MODEL_FNS_CACHE: Dict[ml_collections.FrozenConfigDict, Tuple[Callable, Callable, Callable]] = {}
+_MODEL_FNS_CACHE_SIZE = 8
+# Guards _MODEL_FNS_CACHE, since load_from_workdir_async() loads several workdirs at once.
+_MODEL_FNS_LOCK = threading.Lock()
+
+# The entries of the config that determine the model.
+_MODEL_CONFIG_KEYS = (
+    "dataset",
+    "focus_and_target_species_predictor",
+    "target_position_predictor",
+)
+
+
+def _model_spec(config: ml_collections.ConfigDict) -> ml_collections.FrozenConfigDict:
+    """Returns a hashable spec of the entries of the config that determine the model."""
+    if all(key in config for key in _MODEL_CONFIG_KEYS):
+        return ml_collections.FrozenConfigDict(
+            {key: config[key] for key in _MODEL_CONFIG_KEYS}
+        )
+
+    # Older configs are laid out differently, so we use everything except paths.
+    config_dict = config.to_dict()
+    config_dict.pop("root_dir", None)
+    return ml_collections.FrozenConfigDict(config_dict)
+
+
+def _get_model_fns(
+    config: ml_collections.ConfigDict,
+) -> Tuple[Callable, Callable, Callable]:
+    """Returns the jitted init, apply and eval-mode apply functions for the config, reusing them across calls.
+
+    Configs which differ only in entries that do not affect the model (eg. optimizer settings) share these functions.
+    """
+    spec = _model_spec(config)
+    with _MODEL_FNS_LOCK:
+        if spec not in _MODEL_FNS_CACHE:
+            if len(_MODEL_FNS_CACHE) >= _MODEL_FNS_CACHE_SIZE:
+                _MODEL_FNS_CACHE.pop(next(iter(_MODEL_FNS_CACHE)))
+            net = models.create_model(config, run_in_evaluation_mode=False)
+            eval_net = models.create_model(config, run_in_evaluation_mode=True)
+            _MODEL_FNS_CACHE[spec] = (
+                jax.jit(net.init),
+                jax.jit(net.apply),
+                jax.jit(eval_net.apply),
+            )
+        return _MODEL_FNS_CACHE[spec]
+
+
+def _make_dummy_init_graphs(config: ml_collections.ConfigDict) -> datatypes.Fragments:
+    """Returns zero-filled fragments with the padded sizes from the config, to initialize the model with."""
+    num_species = len(dataset_utils.get_atomic_numbers(config.dataset))
+    num_targets = config.get("max_targets_per_graph", 1)
+    n_node = np.zeros(config.max_n_graphs, dtype=np.int32)
+    n_node[0] = config.max_n_nodes
+    n_edge = np.zeros(config.max_n_graphs, dtype=np.int32)
+    n_edge[0] = config.max_n_edges
+    return datatypes.Fragments(
+        nodes=datatypes.FragmentsNodes(
+            positions=np.zeros((config.max_n_nodes, 3), dtype=np.float32),
+            species=np.zeros(config.max_n_nodes, dtype=np.int32),
+            focus_and_target_species_probs=np.zeros(
+                (config.max_n_nodes, num_species), dtype=np.float32
+            ),
+        ),
+        edges=None,
+        receivers=np.zeros(config.max_n_edges, dtype=np.int32),
+        senders=np.zeros(config.max_n_edges, dtype=np.int32),
+        globals=datatypes.FragmentsGlobals(
+            target_positions_mask=np.zeros(
+                (config.max_n_graphs, num_targets), dtype=bool
+            ),
+            target_positions=np.zeros(
+                (config.max_n_graphs, num_targets, 3), dtype=np.float32
+            ),
+            target_species=np.zeros(config.max_n_graphs, dtype=np.int32),
+            stop=np.zeros(config.max_n_graphs, dtype=bool),
+        ),
+        n_node=n_node,
+        n_edge=n_edge,
+    )
+
+
+def _load_eval_state_from_workdir(
+    workdir: str, config: ml_collections.ConfigDict
+) -> Tuple[ml_collections.ConfigDict, None, train_state.TrainState, Dict[Any, Any]]:
+    """Loads only the best model in eval mode, without the training model or optimizer."""
+    _, _, eval_apply_fn = _get_model_fns(config)
+
+    # Without a target, the checkpoint is restored as a raw state dictionary.
+    data = _restore_checkpoint(
+        workdir, {"best_state": None, "metrics_for_best_state": None}
+    )
+    best_state_in_eval_mode = train_state.TrainState(
+        step=data["best_state"]["step"],
+        apply_fn=eval_apply_fn,
+        params=_device_put_tree(data["best_state"]["params"]),
+        tx=None,
+        opt_state=None,
+    )
+    return (
+        config,
+        None,
+        best_state_in_eval_mode,
+        cast_keys_as_int(data["metrics_for_best_state"]),
+    )
+
+
 def load_from_workdir(
     workdir: str,
     load_pickled_params: bool = True,
     init_graphs: Optional[jraph.GraphsTuple] = None,
+    eval_only: bool = False,
 ) -> Tuple[
     ml_collections.ConfigDict,
-    train_state.TrainState,
+    Optional[train_state.TrainState],
     train_state.TrainState,
     Dict[Any, Any],
 ]:
-    """Loads the config, best model (in train mode), best model (in eval mode) and metrics for the best model."""
+    """Loads the config, best model (in train mode), best model (in eval mode) and metrics for the best model.
+
+    If eval_only is True, the best model in train mode is not constructed and None is returned in its place.
+    """
 
     if not os.path.exists(workdir):
         raise FileNotFoundError(f"{workdir} does not exist.")
@@ -247,73 +561,103 @@ def load_from_workdir(
         raise FileNotFoundError(f"No saved config found at {workdir}")
 
     logging.info("Saved config found at %s", saved_config_path)
-    with open(saved_config_path, "r") as config_file:
-        config = yaml.unsafe_load(config_file)
+    config = _load_config_yml(saved_config_path)
 
     # Check that the config was loaded correctly.
     assert config is not None
     config = ml_collections.ConfigDict(config)
-    if 'max_targets_per_graph' in config:
-        config.root_dir = root_dirs.get_root_dir(
-            config.dataset, config.get("fragment_logic", "nn"), config.max_targets_per_graph
-        )
-    else:
-        config.root_dir = root_dirs.get_root_dir(
-            config.dataset, config.get("fragment_logic", "nn")
-        )
+    config.root_dir = root_dirs.get_root_dir(config.dataset)
+
+    if eval_only:
+        return _load_eval_state_from_workdir(workdir, config)
+
+    # Start reading the checkpoint in the background, while we set up the model.
+    raw_data_future = _IO_EXECUTOR.submit(
+        _restore_checkpoint,
+        workdir,
+        {"best_state": None, "metrics_for_best_state": None},
+    )
 
     # Mimic what we do in train.py.
     rng = jax.random.PRNGKey(config.rng_seed)
-    rng, dataset_rng = jax.random.split(rng)
 
     # Set up dummy variables to obtain the structure.
     rng, init_rng = jax.random.split(rng)
 
-    net = models.create_model(config, run_in_evaluation_mode=False)
-    eval_net = models.create_model(config, run_in_evaluation_mode=True)
+    init_fn, apply_fn, eval_apply_fn = _get_model_fns(config)
 
     # If we have pickled parameters already, we don't need init_graphs to initialize the model.
     # Note that we restore the model parameters from the checkpoint anyways.
     # We only use the pickled parameters to initialize the model, so only the keys of the pickled parameters are important.
-    if load_pickled_params:
+    # If the structure of the parameters was saved, we don't even need to read the parameters.
+    params_structure_file = os.path.join(workdir, "checkpoints", "params_structure.pkl")
+    if load_pickled_params and os.path.exists(params_structure_file):
+        logging.info(
+            "Initializing dummy model with params structure found at %s",
+            params_structure_file,
+        )
+
+        with open(params_structure_file, "rb") as f:
+            params_structure = pickle.load(f)
+
+        # Each leaf is saved as a (shape, dtype name) pair.
+        params_shapes = jax.tree_util.tree_map(
+            lambda leaf: jax.ShapeDtypeStruct(leaf[0], jnp.dtype(leaf[1])),
+            params_structure,
+            is_leaf=lambda x: isinstance(x, tuple),
+        )
+        params = jax.tree_util.tree_map(
+            lambda leaf: np.empty(leaf.shape, leaf.dtype), params_shapes
+        )
+    elif load_pickled_params:
         checkpoint_dir = os.path.join(workdir, "checkpoints")
-        pickled_params_file = os.path.join(checkpoint_dir, "params_best.pkl")
-        if not os.path.exists(pickled_params_file):
-            pickled_params_file = os.path.join(checkpoint_dir, "params_best.pkl")
-            if not os.path.exists(pickled_params_file):
-                raise FileNotFoundError(
-                    f"No pickled params found at {pickled_params_file}"
-                )
+        saved_params_files = [
+            os.path.join(checkpoint_dir, "params_best.msgpack"),
+            os.path.join(checkpoint_dir, "params_best.pkl"),
+        ]
+        if not any(os.path.exists(path) for path in saved_params_files):
+            raise FileNotFoundError(
+                f"No saved params found at {saved_params_files[-1]}"
+            )
 
         logging.info(
-            "Initializing dummy model with pickled params found at %s",
-            pickled_params_file,
+            "Initializing dummy model with saved params found at %s",
+            checkpoint_dir,
         )
 
-        with open(pickled_params_file, "rb") as f:
-            params = jax.tree_util.tree_map(np.array, pickle.load(f))
+        # Only the structure matters here, so we use uninitialized arrays instead of copying the values.
+        params = jax.tree_util.tree_map(
+            lambda leaf: np.empty(np.shape(leaf), np.result_type(leaf)),
+            _read_params(workdir, "best"),
+        )
     else:
         if init_graphs is None:
-            logging.info("Initializing dummy model with init_graphs from dataloader")
-            datasets = input_pipeline_tf.get_datasets(dataset_rng, config)
-            train_iter = datasets["train"].as_numpy_iterator()
-            init_graphs = next(train_iter)
+            logging.info("Initializing dummy model with dummy init_graphs")
+            init_graphs = _make_dummy_init_graphs(config)
         else:
             logging.info("Initializing dummy model with provided init_graphs")
 
-        params = jax.jit(net.init)(init_rng, init_graphs)
+        # The values are restored from the checkpoint, so we only need the shapes of the parameters.
+        params_shapes = jax.eval_shape(init_fn, init_rng, init_graphs)
+        params = jax.tree_util.tree_map(
+            lambda leaf: np.empty(leaf.shape, leaf.dtype), params_shapes
+        )
+
+    # symphony.train pulls in the whole training stack, so we only import it when needed.
+    _hide_gpus_from_tf()
+    from symphony import train
 
     tx = train.create_optimizer(config)
     dummy_state = train_state.TrainState.create(
-        apply_fn=net.apply, params=params, tx=tx
+        apply_fn=apply_fn, params=params, tx=tx
     )
 
-    # Load the actual values.
-    checkpoint_dir = os.path.join(workdir, "checkpoints")
-    ckpt = checkpoint.Checkpoint(checkpoint_dir, max_to_keep=5)
-    data = ckpt.restore({"best_state": dummy_state, "metrics_for_best_state": None})
-    best_state = jax.tree_util.tree_map(jnp.asarray, data["best_state"])
-    best_state_in_eval_mode = best_state.replace(apply_fn=eval_net.apply)
+    # Fill in the actual values.
+    data = raw_data_future.result()
+    best_state = _device_put_tree(
+        flax.serialization.from_state_dict(dummy_state, data["best_state"])
+    )
+    best_state_in_eval_mode = best_state.replace(apply_fn=eval_apply_fn)
 
     return (
         config,
@@ -323,6 +667,16 @@ def load_from_workdir(
     )
 
 
+def load_from_workdir_async(
+    workdir: str, **kwargs
+) -> concurrent.futures.Future:
+    """Schedules load_from_workdir() on a background thread, returning a future for its result.
+
+    This lets callers overlap the disk I/O of loading many workdirs.
+    """
+    return _LOAD_EXECUTOR.submit(load_from_workdir, workdir, **kwargs)
+
+
 def construct_molecule(molecule_str: str) -> Tuple[ase.Atoms, str]:
     """Returns a molecule from the given input string.
 
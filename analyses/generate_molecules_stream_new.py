@@ -1,5 +1,6 @@
 from typing import Dict, Tuple, Sequence, Union, Callable
 import concurrent.futures
+import functools
 import os
 import time
 
@@ -96,6 +97,9 @@ def estimate_padding_budget(
     def round_to_nearest_multiple_of_64(x):
         return int(np.ceil(x / 64) * 64)
 
+    def round_to_next_power_of_two(x):
+        return int(2 ** np.ceil(np.log2(max(x, 64))))
+
     if padding_mode == "fixed":
         avg_nodes_per_graph = 50
         avg_edges_per_graph = 500
@@ -111,18 +115,45 @@ def estimate_padding_budget(
 
     avg_nodes_per_graph = max(avg_nodes_per_graph, 1)
     avg_edges_per_graph = max(avg_edges_per_graph, 1)
+    # Dynamic budgets change as the fragments grow, so round them up to powers of two
+    # to keep the number of distinct shapes (and thus recompilations) logarithmic.
+    if padding_mode == "dynamic":
+        round_fn = round_to_next_power_of_two
+    else:
+        round_fn = round_to_nearest_multiple_of_64
     padding_budget = dict(
-        n_node=round_to_nearest_multiple_of_64(
-            num_seeds_per_chunk * avg_nodes_per_graph * 1.5
-        ),
-        n_edge=round_to_nearest_multiple_of_64(
-            num_seeds_per_chunk * avg_edges_per_graph * 1.5
-        ),
+        n_node=round_fn(num_seeds_per_chunk * avg_nodes_per_graph * 1.5),
+        n_edge=round_fn(num_seeds_per_chunk * avg_edges_per_graph * 1.5),
         n_graph=num_seeds_per_chunk,
     )
     return padding_budget
 
 
+@functools.lru_cache(maxsize=8)
+def _get_jitted_apply_fn(
+    apply_fn: Callable[..., datatypes.Predictions],
+    focus_and_atom_type_inverse_temperature: float,
+    position_inverse_temperature: float,
+) -> Callable[
+    [optax.Params, datatypes.Fragments, chex.PRNGKey],
+    Tuple[datatypes.Fragments, datatypes.Predictions],
+]:
+    """Returns a jitted apply function, cached so repeated calls reuse the compiled versions."""
+
+    @jax.jit
+    def apply_fn_wrapped(params, batch, apply_rng):
+        preds = apply_fn(
+            params,
+            apply_rng,
+            batch,
+            focus_and_atom_type_inverse_temperature,
+            position_inverse_temperature,
+        )
+        return batch, preds
+
+    return apply_fn_wrapped
+
+
 def generate_molecules_from_workdir(
     workdir: str,
     outputdir: str,
@@ -230,16 +261,12 @@ def generate_molecules(
     else:
         raise ValueError(f"Unknown dataset: {dataset}")
 
-    @jax.jit
-    def apply_fn_wrapped(batch, apply_rng):
-        preds = apply_fn(
-            params,
-            apply_rng,
-            batch,
-            focus_and_atom_type_inverse_temperature,
-            position_inverse_temperature,
-        )
-        return batch, preds
+    # The params are passed as an argument, so that new params do not trigger recompilation.
+    apply_fn_wrapped = _get_jitted_apply_fn(
+        apply_fn,
+        focus_and_atom_type_inverse_temperature,
+        position_inverse_temperature,
+    )
 
     # Create output directories.
     os.makedirs(molecules_outputdir, exist_ok=True)
@@ -281,7 +308,9 @@ def generate_molecules(
                 apply_rng, rng = jax.random.split(rng)
 
                 # Predict on this batch.
-                gpu_future = executor.submit(apply_fn_wrapped, fragments, apply_rng)
+                gpu_future = executor.submit(
+                    apply_fn_wrapped, params, fragments, apply_rng
+                )
                 gpu_futures.append(gpu_future)
                 indices.extend(fragment_indices)
 
@@ -12,6 +12,7 @@ import sys
 
 from ase.db import connect
 import ase.io
+import ml_collections
 import numpy as np
 import pandas as pd
 import tqdm
@@ -185,6 +186,10 @@ def find_in_training_data(
     with open(saved_config_path, "r") as config_file:
         config = yaml.unsafe_load(config_file)
 
+    # Newer configs are saved as plain dictionaries.
+    assert config is not None
+    config = ml_collections.ConfigDict(config)
+
     train_idx = np.array(range(config.train_molecules[0], config.train_molecules[1]))
     val_idx = np.array(range(config.val_molecules[0], config.val_molecules[1]))
     test_idx = np.array(range(config.test_molecules[0], config.test_molecules[1]))
@@ -1,11 +1,14 @@
-from typing import Optional, Sequence
+from typing import Dict, Optional, Sequence
 import plotly.graph_objects as go
 import plotly.subplots
 import numpy as np
+import jax
+import jax.numpy as jnp
 import e3nn_jax as e3nn
 import ase
 import rdkit
 import rdkit.Chem.PyMol
+import functools
 import os
 import time
 
@@ -38,6 +41,16 @@ with importlib.resources.open_text("analyses", 'elements.ini') as f:  # taken fr
         ATOMIC_COLORS[z] = f"rgb({255 * r}, {255 * g}, {255 * b})"
         ATOMIC_SIZES[z] = float(radius) * 20
 
+# Dense lookup tables indexed by atomic number, for vectorized marker attributes.
+_ATOMIC_SIZES_TABLE = np.zeros(max(ATOMIC_NUMBERS) + 1)
+_ATOMIC_COLORS_TABLE = np.full(max(ATOMIC_NUMBERS) + 1, "", dtype=object)
+for z in ATOMIC_SIZES:
+    _ATOMIC_SIZES_TABLE[z] = ATOMIC_SIZES[z]
+    _ATOMIC_COLORS_TABLE[z] = ATOMIC_COLORS[z]
+_ELEMENT_HOVERTEXT_TABLE = np.asarray(
+    [f"Element: {symbol}" for symbol in ase.data.chemical_symbols], dtype=object
+)
+
 
 def get_title_for_name(name: str) -> str:
     """Returns the title for the given name."""
@@ -61,29 +74,21 @@ def combine_visualizations(
         all_traces.extend(fig.data)
 
     # Save the original visibility of the traces.
-    original_visibility = {i: trace.visible for i, trace in enumerate(all_traces)}
+    original_visibility = np.asarray([trace.visible for trace in all_traces], dtype=object)
 
-    steps = []
-    ct = 0
-    start_indices = [0]
-    for fig in figs:
-        steps.append(
-            dict(
-                method="restyle",
-                args=[
-                    {
-                        "visible": [
-                            original_visibility[i]
-                            if ct <= i < ct + len(fig.data)
-                            else False
-                            for i, trace in enumerate(all_traces)
-                        ]
-                    }
-                ],
-            )
+    # Each step shows only the traces of its figure, with their original visibility.
+    start_indices = np.cumsum([0] + [len(fig.data) for fig in figs])
+    trace_indices = np.arange(len(all_traces))
+    in_figure = (start_indices[:-1, None] <= trace_indices[None, :]) & (
+        trace_indices[None, :] < start_indices[1:, None]
+    )
+    steps = [
+        dict(
+            method="restyle",
+            args=[{"visible": np.where(mask, original_visibility, False).tolist()}],
         )
-        ct += len(fig.data)
-        start_indices.append(ct)
+        for mask in in_figure
+    ]
 
     if label_name is None:
         label_name = "steps"
@@ -131,25 +136,35 @@ def combine_visualizations(
         ),
     )
 
+    cols = []
     for i, trace in enumerate(all_traces):
         visible = original_visibility[i] if i < start_indices[1] else False
         trace.update(visible=visible)
         if trace.type in ["scatter3d", "surface"]:
-            col = 1
+            cols.append(1)
         else:
-            col = 2
-        fig_all.add_trace(trace, row=1, col=col)
+            cols.append(2)
+    # Add all traces in one call, preserving their order for the slider steps.
+    fig_all.add_traces(all_traces, rows=1, cols=cols)
     fig_all.update_layout(layout)
     return fig_all
 
 
+def _atomic_numbers_np(species: np.ndarray, dataset: str) -> np.ndarray:
+    """Returns the atomic numbers for the species as a NumPy array, without dispatching to JAX."""
+    atomic_numbers = np.asarray(dataset_utils.get_atomic_numbers(dataset))
+    return atomic_numbers[np.asarray(species)]
+
+
 def get_plotly_traces_for_fragment(
     fragment: datatypes.Fragments,
     dataset: str = "qm9",
+    fragment_atomic_numbers: Optional[np.ndarray] = None,
 ) -> Sequence[go.Scatter3d]:
     """Returns the plotly traces for the fragment."""
     atomic_numbers = dataset_utils.get_atomic_numbers(dataset)
-    fragment_atomic_numbers = atomic_numbers[fragment.nodes.species]
+    if fragment_atomic_numbers is None:
+        fragment_atomic_numbers = _atomic_numbers_np(fragment.nodes.species, dataset)
     molecule_traces = []
     molecule_traces.append(
         go.Scatter3d(
@@ -158,29 +173,32 @@ def get_plotly_traces_for_fragment(
             z=fragment.nodes.positions[:, 2],
             mode="markers",
             marker=dict(
-                size=[ATOMIC_SIZES[num] for num in fragment_atomic_numbers],
-                color=[ATOMIC_COLORS[num] for num in fragment_atomic_numbers],
+                size=_ATOMIC_SIZES_TABLE[fragment_atomic_numbers],
+                color=_ATOMIC_COLORS_TABLE[fragment_atomic_numbers],
             ),
-            hovertext=[
-                f"Element: {ase.data.chemical_symbols[num]}" for num in fragment_atomic_numbers
-            ],
+            hovertext=_ELEMENT_HOVERTEXT_TABLE[fragment_atomic_numbers],
             opacity=1.0,
             name="Molecule Atoms",
             legendrank=1,
         )
     )
-    # Add fragment edges.
-    edge_count = 0
-    for i, j in zip(fragment.senders, fragment.receivers):
-        edge_count += 1
+    # Add fragment edges, as a single trace with NaN gaps between the segments.
+    positions = np.asarray(fragment.nodes.positions)
+    senders = np.asarray(fragment.senders)
+    receivers = np.asarray(fragment.receivers)
+    if len(senders) > 0:
+        gaps = np.full((len(senders), 3), np.nan)
+        edge_positions = np.stack(
+            [positions[senders], positions[receivers], gaps], axis=1
+        ).reshape(-1, 3)
         molecule_traces.append(
             go.Scatter3d(
-                x=fragment.nodes.positions[[i, j], 0],
-                y=fragment.nodes.positions[[i, j], 1],
-                z=fragment.nodes.positions[[i, j], 2],
+                x=edge_positions[:, 0],
+                y=edge_positions[:, 1],
+                z=edge_positions[:, 2],
                 line=dict(color="black"),
                 mode="lines",
-                showlegend=(edge_count == 1),
+                connectgaps=False,
                 visible="legendonly",
                 name="Edges",
                 legendgroup="Edges",
@@ -204,22 +222,14 @@ def get_plotly_traces_for_fragment(
                     z=target_positions[:, 2],
                     mode="markers",
                     marker=dict(
-                        size=[
-                            ATOMIC_SIZES[target_atomic_number]
-                            for _ in target_positions
-                        ],
-                        color=[
-                            ATOMIC_COLORS[target_atomic_number]
-                            for _ in target_positions
-                        ],
+                        size=ATOMIC_SIZES[target_atomic_number],
+                        color=ATOMIC_COLORS[target_atomic_number],
                         line=dict(
                             color='red',
                             width=3,
                         )
                     ),
-                    hovertext=[
-                        f"Element: {ase.data.chemical_symbols[target_atomic_number]}" for _ in target_positions
-                    ],
+                    hovertext=f"Element: {ase.data.chemical_symbols[target_atomic_number]}",
                     opacity=0.5,
                     name="Target Atoms",
                 )
@@ -228,27 +238,100 @@ def get_plotly_traces_for_fragment(
     return molecule_traces
 
 
+def _downsample_surface(
+    surface: Dict[str, np.ndarray], threshold: float, stride: int = 2
+) -> Dict[str, np.ndarray]:
+    """Subsamples a plotly surface dictionary, and hides vertices with values below the threshold."""
+    num_rows, num_cols = np.shape(surface["surfacecolor"])
+    # Always keep the last row and column, so that the surface stays closed.
+    rows = np.unique(np.append(np.arange(0, num_rows, stride), num_rows - 1))
+    cols = np.unique(np.append(np.arange(0, num_cols, stride), num_cols - 1))
+    downsampled = {
+        key: np.asarray(values, dtype=float)[np.ix_(rows, cols)]
+        for key, values in surface.items()
+    }
+    hidden = downsampled["surfacecolor"] < threshold
+    for key in ["x", "y", "z"]:
+        downsampled[key][hidden] = np.nan
+    return downsampled
+
+
+def _stack_surfaces(surfaces: Sequence[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """Stacks plotly surface dictionaries into one, with NaN rows as gaps between them."""
+    stacked = {}
+    for key in surfaces[0]:
+        rows = []
+        for surface in surfaces:
+            values = np.asarray(surface[key], dtype=float)
+            rows.append(values)
+            rows.append(np.full((1, values.shape[1]), np.nan))
+        stacked[key] = np.concatenate(rows[:-1], axis=0)
+    return stacked
+
+
+@functools.partial(jax.jit, static_argnums=(1, 2, 3))
+def _compute_viz_grids(
+    position_coeffs: e3nn.IrrepsArray, res_beta: int, res_alpha: int, num_radii: int
+):
+    """Computes the position probabilities and logit signals on the grid, with their color ranges."""
+    position_logits = models.log_coeffs_to_logits(
+        position_coeffs, res_beta, res_alpha, num_radii
+    )
+    position_logits.grid_values -= jnp.max(position_logits.grid_values)
+    position_probs = position_logits.apply(jnp.exp)
+    all_sigs = e3nn.to_s2grid(
+        position_coeffs, res_beta, res_alpha, quadrature="soft", p_val=1, p_arg=-1
+    )
+    return (
+        position_probs,
+        all_sigs,
+        position_probs.grid_values.max(),
+        all_sigs.grid_values.min(),
+        all_sigs.grid_values.max(),
+    )
+
+
 def get_plotly_traces_for_predictions(
     pred: datatypes.Predictions, fragment: datatypes.Fragments,
     dataset: str = "qm9",
+    atomic_numbers: Optional[np.ndarray] = None,
 ) -> Sequence[go.Scatter3d]:
     """Returns a list of plotly traces for the prediction."""
 
-    atomic_numbers = list(
-        int(num) for num in dataset_utils.species_to_atomic_numbers(fragment.nodes.species, dataset)
+    if atomic_numbers is None:
+        atomic_numbers = _atomic_numbers_np(fragment.nodes.species, dataset)
+    # Transfer everything we need to the host at once, rather than syncing on each value.
+    position_coeffs = pred.globals.log_position_coeffs
+    radii = pred.globals.radial_bins
+    num_radii = radii.shape[0]
+    host_vals = jax.device_get(
+        {
+            "focus": pred.globals.focus_indices,
+            "target_species": pred.globals.target_species,
+            "stop": pred.globals.stop,
+            "stop_prob": pred.globals.stop_probs,
+            "position_vectors": pred.globals.position_vectors,
+            "focus_and_target_species_probs": pred.nodes.focus_and_target_species_probs,
+            "positions": fragment.nodes.positions,
+            "radii": radii,
+            "viz_grids": _compute_viz_grids(position_coeffs, 50, 99, num_radii),
+        }
     )
-    focus = pred.globals.focus_indices.item()
-    focus_position = fragment.nodes.positions[focus]
-    focus_and_target_species_probs = pred.nodes.focus_and_target_species_probs
+    position_probs, all_sigs, probs_cmax, sigs_cmin, sigs_cmax = host_vals["viz_grids"]
+    radii = host_vals["radii"]
+
+    focus = host_vals["focus"].item()
+    focus_position = host_vals["positions"][focus]
+    focus_and_target_species_probs = host_vals["focus_and_target_species_probs"]
     focus_probs = focus_and_target_species_probs.sum(axis=-1)
     num_nodes, num_elements = focus_and_target_species_probs.shape
 
     # Highlight the focus probabilities, obtained by marginalization over all elements.
-    def get_scaling_factor(focus_prob: float, num_nodes: int) -> float:
-        """Returns a scaling factor for the size of the atom."""
-        if focus_prob < 1 / num_nodes - 1e-3:
-            return 0.95
-        return 1 + focus_prob**2
+    # Atoms less likely than uniform are shrunk slightly, the rest are scaled up.
+    focus_probs = np.asarray(focus_probs)
+    scaling_factors = np.where(
+        focus_probs < 1 / num_nodes - 1e-3, 0.95, 1 + focus_probs**2
+    )
 
     def chosen_focus_string(index: int, focus: int) -> str:
         """Returns a string indicating whether the atom was chosen as the focus."""
@@ -264,11 +347,8 @@ def get_plotly_traces_for_predictions(
             z=fragment.nodes.positions[:, 2],
             mode="markers",
             marker=dict(
-                size=[
-                    get_scaling_factor(float(focus_prob), num_nodes) * ATOMIC_SIZES[num]
-                    for focus_prob, num in zip(focus_probs, atomic_numbers)
-                ],
-                color=["rgba(150, 75, 0, 0.5)" for _ in range(num_nodes)],
+                size=scaling_factors * _ATOMIC_SIZES_TABLE[atomic_numbers],
+                color="rgba(150, 75, 0, 0.5)",
             ),
             hovertext=[
                 f"Focus Probability: {focus_prob:.3f}<br>{chosen_focus_string(i, focus)}"
@@ -279,8 +359,8 @@ def get_plotly_traces_for_predictions(
     )
 
     # Highlight predicted position, if not stopped.
-    if not pred.globals.stop:
-        predicted_target_position = focus_position + pred.globals.position_vectors
+    if not host_vals["stop"]:
+        predicted_target_position = focus_position + host_vals["position_vectors"]
         molecule_traces.append(
             go.Scatter3d(
                 x=[predicted_target_position[0]],
@@ -291,7 +371,7 @@ def get_plotly_traces_for_predictions(
                     size=[
                         1.05
                         * ATOMIC_SIZES[
-                            ATOMIC_NUMBERS[pred.globals.target_species.item()]
+                            ATOMIC_NUMBERS[host_vals["target_species"].item()]
                         ]
                     ],
                     color=["purple"],
@@ -301,54 +381,45 @@ def get_plotly_traces_for_predictions(
             )
         )
 
-    # Since we downsample the position grid, we need to recompute the position probabilities.
-    position_coeffs = pred.globals.log_position_coeffs
-    radii = pred.globals.radial_bins
-    num_radii = radii.shape[0]
-    position_logits = models.log_coeffs_to_logits(position_coeffs, 50, 99, num_radii)
-    position_logits.grid_values -= np.max(position_logits.grid_values)
-    position_probs = position_logits.apply(np.exp)
-
-    r_surface_count = 0
+    # Since we downsample the position grid, we recomputed the position probabilities above.
+    # Merge all radius shells into a single surface, separated by NaN rows.
     cmin = 0.0
-    cmax = position_probs.grid_values.max().item()
-    for i in range(len(radii)):
-        prob_r = position_probs[i]
-
+    cmax = probs_cmax.item()
+    shells = [
+        _downsample_surface(
+            position_probs[i].plotly_surface(radius=radii[i], translation=focus_position),
+            threshold=1e-2 * cmax,
+        )
+        for i in range(len(radii))
         # Skip if the probability is too small.
-        if prob_r.grid_values.max() < 1e-2 * cmax:
-            continue
-
-        r_surface_count += 1
-        r_surface = go.Surface(
-            **prob_r.plotly_surface(radius=radii[i], translation=focus_position),
-            colorscale=[[0, "rgba(4, 59, 192, 0.)"], [1, "rgba(4, 59, 192, 1.)"]],
-            showscale=False,
-            cmin=cmin,
-            cmax=cmax,
-            name="Position Probabilities",
-            legendgroup="Position Probabilities",
-            showlegend=(r_surface_count == 1),
-            visible="legendonly",
+        if position_probs[i].grid_values.max() >= 1e-2 * cmax
+    ]
+    if shells:
+        molecule_traces.append(
+            go.Surface(
+                **_stack_surfaces(shells),
+                colorscale=[[0, "rgba(4, 59, 192, 0.)"], [1, "rgba(4, 59, 192, 1.)"]],
+                showscale=False,
+                cmin=cmin,
+                cmax=cmax,
+                name="Position Probabilities",
+                legendgroup="Position Probabilities",
+                showlegend=True,
+                visible="legendonly",
+            )
         )
-        molecule_traces.append(r_surface)
 
     # Plot spherical harmonic projections of logits.
     # Find closest index in RADII to the sampled positions.
-    radii = pred.globals.radial_bins
-    radius = np.linalg.norm(pred.globals.position_vectors, axis=-1)
-    most_likely_radius_index = np.abs(radii - radius).argmin()
+    # The radii and position vectors are already on the host, so this avoids any device dispatch.
+    radius = np.linalg.norm(host_vals["position_vectors"], axis=-1)
+    most_likely_radius_index = int(np.abs(radii - radius).argmin())
     most_likely_radius = radii[most_likely_radius_index]
-    all_sigs = e3nn.to_s2grid(
-        position_coeffs, 50, 99, quadrature="soft", p_val=1, p_arg=-1
-    )
-    cmin = all_sigs.grid_values.min().item()
-    cmax = all_sigs.grid_values.max().item()
+    cmin = sigs_cmin.item()
+    cmax = sigs_cmax.item()
+    # The signals for all channels were already computed together, so we only need to index them.
     for channel in range(position_coeffs.shape[0]):
-        most_likely_radius_coeffs = position_coeffs[channel, most_likely_radius_index]
-        most_likely_radius_sig = e3nn.to_s2grid(
-            most_likely_radius_coeffs, 50, 99, quadrature="soft", p_val=1, p_arg=-1
-        )
+        most_likely_radius_sig = all_sigs[channel, most_likely_radius_index]
         spherical_harmonics = go.Surface(
             most_likely_radius_sig.plotly_surface(
                 scale_radius_by_amplitude=True,
@@ -365,8 +436,8 @@ def get_plotly_traces_for_predictions(
         molecule_traces.append(spherical_harmonics)
 
     # Plot target species probabilities.
-    stop_probability = pred.globals.stop_probs.item()
-    predicted_target_species = pred.globals.target_species.item()
+    stop_probability = host_vals["stop_prob"].item()
+    predicted_target_species = host_vals["target_species"].item()
     if fragment.globals is not None and not fragment.globals.stop:
         true_focus = 0  # This is a convention used in our training pipeline.
         true_target_species = fragment.globals.target_species.item()
@@ -400,7 +471,7 @@ def get_plotly_traces_for_predictions(
                 for index, elem in enumerate(ELEMENTS[:num_elements])
             ],
             y=[get_focus_string(i) for i in range(num_nodes)],
-            z=np.round(pred.nodes.focus_and_target_species_probs, 3),
+            z=np.round(focus_and_target_species_probs, 3),
             texttemplate="%{z}",
             showlegend=False,
             showscale=False,
@@ -435,8 +506,7 @@ def visualize_fragment(
 
     # Traces corresponding to the input fragment.
     fragment_traces = get_plotly_traces_for_fragment(fragment)
-    for trace in fragment_traces:
-        fig.add_trace(trace, row=1, col=1)
+    fig.add_traces(fragment_traces, rows=1, cols=1)
 
     # Update the layout.
     axis = dict(
@@ -485,44 +555,47 @@ def visualize_predictions(
         subplot_titles=("Input Fragment", "Predictions", "", ""),
     )
 
+    # Both sets of traces need the atomic numbers of the fragment, so we decode them once.
+    atomic_numbers = _atomic_numbers_np(fragment.nodes.species, "qm9")
+
     # Traces corresponding to the input fragment.
-    fragment_traces = get_plotly_traces_for_fragment(fragment)
+    fragment_traces = get_plotly_traces_for_fragment(
+        fragment, fragment_atomic_numbers=atomic_numbers
+    )
 
     # Traces corresponding to the prediction.
     (
         predicted_fragment_traces,
         focus_and_atom_type_traces,
         stop_traces,
-    ) = get_plotly_traces_for_predictions(pred, fragment)
+    ) = get_plotly_traces_for_predictions(pred, fragment, atomic_numbers=atomic_numbers)
 
+    # The fragment is drawn in both scenes, but only listed once in the legend.
+    fig.add_traces(fragment_traces, rows=1, cols=1)
     for trace in fragment_traces:
-        fig.add_trace(trace, row=1, col=1)
         trace.showlegend = False
-        fig.add_trace(trace, row=1, col=2)
 
-    for trace in predicted_fragment_traces:
-        fig.add_trace(trace, row=1, col=2)
-
-    for trace in focus_and_atom_type_traces:
-        fig.add_trace(trace, row=1, col=3)
-
-    for trace in stop_traces:
-        fig.add_trace(trace, row=1, col=4)
+    traces_and_cols = [
+        (fragment_traces, 2),
+        (predicted_fragment_traces, 2),
+        (focus_and_atom_type_traces, 3),
+        (stop_traces, 4),
+    ]
+    fig.add_traces(
+        [trace for traces, _ in traces_and_cols for trace in traces],
+        rows=1,
+        cols=[col for traces, col in traces_and_cols for _ in traces],
+    )
 
     # Update the layout.
-    centre_of_mass = np.mean(fragment.nodes.positions, axis=0)
-    furthest_dist = np.max(
-        np.linalg.norm(
-            fragment.nodes.positions + pred.globals.position_vectors - centre_of_mass,
-            axis=-1,
-        )
-    )
-    furthest_dist = np.max(
-        np.linalg.norm(
-            fragment.nodes.positions - pred.globals.position_vectors - centre_of_mass,
-            axis=-1,
-        )
-    )
+    positions = np.asarray(fragment.nodes.positions)
+    position_vectors = np.asarray(pred.globals.position_vectors)
+    centre_of_mass = np.mean(positions, axis=0)
+    furthest_dist = np.linalg.norm(
+        np.concatenate([positions + position_vectors, positions - position_vectors])
+        - centre_of_mass,
+        axis=-1,
+    ).max()
     min_range = centre_of_mass - furthest_dist
     max_range = centre_of_mass + furthest_dist
     axis = dict(
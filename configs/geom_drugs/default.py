@@ -62,6 +62,7 @@ def get_config() -> ml_collections.ConfigDict:
     config.target_position_predictor.angular_predictor.sampling_inverse_temperature_factor = 10.0
     config.target_position_predictor.angular_predictor.sampling_num_steps = 1000
     config.target_position_predictor.angular_predictor.sampling_init_step_size = 10.0
+    config.target_position_predictor.angular_predictor.readout_dtype = "float32"
 
     config.target_position_predictor.radial_predictor = ml_collections.ConfigDict()
     config.target_position_predictor.radial_predictor.num_bins = 16
@@ -18,6 +18,7 @@ def get_embedder_config() -> ml_collections.ConfigDict:
     config.max_ell = 2
     config.activation = "shifted_softplus"
     config.periodic_table_embedding = False
+    config.scan_interactions = False
 
     return config
 
@@ -1,23 +1,40 @@
 """Root directories for datasets."""
 
 from typing import Optional
+import functools
 import os
+import socket
+
+
+# Base directories containing the root directories for each dataset, by hostname and username.
+_ROOT_DIRS_BY_HOSTNAME = {
+    "radish.mit.edu": "/data/NFS/radish/symphony/root_dirs",
+    "potato.mit.edu": "/radish/symphony/root_dirs",
+}
+_ROOT_DIRS_BY_USERNAME = {
+    "ameyad": "/Users/ameyad/Documents/spherical-harmonic-net/root_dirs",
+    "songk": "/Users/songk/atomicarchitects/spherical_harmonic_net/root_dirs",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _get_base_root_dir() -> Optional[str]:
+    """Get the base directory containing the root directories for all datasets on this machine."""
+    hostname = socket.gethostname()
+    if hostname in _ROOT_DIRS_BY_HOSTNAME:
+        return _ROOT_DIRS_BY_HOSTNAME[hostname]
+    return _ROOT_DIRS_BY_USERNAME.get(os.environ.get("USER"))
 
 
 def get_root_dir(dataset: str) -> Optional[str]:
-    """Get the root directory for the dataset."""
-    hostname, username = os.uname()[1], os.environ.get("USER")
+    """Get the root directory for the dataset.
 
-    if hostname == "radish.mit.edu":
-        return f"/data/NFS/radish/symphony/root_dirs/{dataset}"
-    if hostname == "potato.mit.edu":
-        return f"/radish/symphony/root_dirs/{dataset}"
-    if username == "ameyad":
-        return f"/Users/ameyad/Documents/spherical-harmonic-net/root_dirs/{dataset}"
-    if username == "songk":
-        return "/Users/songk/atomicarchitects/spherical_harmonic_net/root_dirs/{dataset}"
-    
-    return None
+    The SYMPHONY_ROOT_DIR environment variable, if set, overrides the base directory.
+    """
+    base_root_dir = os.environ.get("SYMPHONY_ROOT_DIR") or _get_base_root_dir()
+    if base_root_dir is None:
+        return None
+    return f"{base_root_dir}/{dataset}"
 
 
 def get_root_dir_tf(dataset: str, fragment_logic: str) -> Optional[str]:
@@ -91,6 +91,18 @@ def create_fragments_dataset(
     return fragment_generator(rng)
 
 
+def bucket_padding_budget(
+    n_node: int, n_edge: int, n_graph: int
+) -> Tuple[int, int, int]:
+    """Rounds a padding budget up to buckets, so that small changes to the budget do not change the padded shapes."""
+
+    def next_multiple(val: int, multiple: int) -> int:
+        """Returns the smallest multiple of multiple that is at least val."""
+        return multiple * -(-val // multiple)
+
+    return next_multiple(n_node, 8), next_multiple(n_edge, 64), n_graph
+
+
 def estimate_padding_budget(
     fragments_iterator: Iterator[datatypes.Fragments],
     num_graphs: int,
@@ -159,6 +171,10 @@ def pad_and_batch_fragments(
         max_n_nodes, max_n_edges, max_n_graphs = estimate_padding_budget(
             fragments_iterator, max_n_graphs, num_estimation_graphs=1000
         )
+    else:
+        max_n_nodes, max_n_edges, max_n_graphs = bucket_padding_budget(
+            max_n_nodes, max_n_edges, max_n_graphs
+        )
 
     logging.info(
         "Padding budget %s as: n_nodes = %d, n_edges = %d, n_graphs = %d",
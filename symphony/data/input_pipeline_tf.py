@@ -41,7 +41,7 @@ def get_datasets(
         )
 
     else:
-        max_n_nodes, max_n_edges, max_n_graphs = (
+        max_n_nodes, max_n_edges, max_n_graphs = input_pipeline.bucket_padding_budget(
             config.max_n_nodes,
             config.max_n_edges,
             config.max_n_graphs,
@@ -6,12 +6,14 @@ import tempfile
 import pickle
 
 import flax
+import flax.serialization
 import chex
 from absl import logging
 import flax.struct
 from rdkit import Chem
 import wandb
 from clu import metric_writers, checkpoint
+import jax
 import jax.numpy as jnp
 
 
@@ -229,6 +231,23 @@ class CheckpointHook:
         with open(os.path.join(self.checkpoint_dir, "params_best.pkl"), "wb") as f:
             pickle.dump(state.best_params, f)
 
+        # Also save a msgpack copy of the best params, which is much faster to load than a pickle.
+        with open(os.path.join(self.checkpoint_dir, "params_best.msgpack"), "wb") as f:
+            f.write(flax.serialization.msgpack_serialize(state.best_params))
+
+        # Save the structure of the params, so they can be restored without initializing the model.
+        # This is rewritten every time, in case the model changed when restarting in the same workdir.
+        # Each leaf is stored as a plain (shape, dtype name) pair, so the file does not depend on the JAX version.
+        with open(
+            os.path.join(self.checkpoint_dir, "params_structure.pkl"), "wb"
+        ) as f:
+            pickle.dump(
+                jax.tree_util.tree_map(
+                    lambda x: (tuple(x.shape), jnp.dtype(x.dtype).name), state.params
+                ),
+                f,
+            )
+
         # Save the best params as a wandb artifact.
         if wandb.run is not None:
             artifact = wandb.Artifact(
@@ -8,6 +8,7 @@ import e3nn_jax as e3nn
 
 
 from symphony.models.angular_predictors import AngularPredictor
+from symphony.models.utils import utils
 
 
 class LinearAngularPredictor(AngularPredictor):
@@ -26,6 +27,7 @@ class LinearAngularPredictor(AngularPredictor):
         sampling_inverse_temperature_factor: float,
         sampling_num_steps: int,
         sampling_init_step_size: float,
+        readout_dtype: str = "float32",
     ):
         super().__init__()
         self.max_ell = max_ell
@@ -39,6 +41,8 @@ class LinearAngularPredictor(AngularPredictor):
         self.sampling_inverse_temperature_factor = sampling_inverse_temperature_factor
         self.sampling_num_steps = sampling_num_steps
         self.sampling_init_step_size = sampling_init_step_size
+        self.readout_dtype = jnp.dtype(readout_dtype)
+        self.s2_irreps = e3nn.s2_irreps(self.max_ell)
 
     def coeffs(self, radius: float, conditioning: e3nn.IrrepsArray) -> e3nn.IrrepsArray:
         """Computes the spherical harmonic coefficients at the given radius."""
@@ -54,9 +58,13 @@ class LinearAngularPredictor(AngularPredictor):
         )(radial_embed)
 
         conditioning *= radial_embed
-        coeffs = e3nn.haiku.Linear(
-            irreps_out=e3nn.s2_irreps(self.max_ell), channel_out=self.num_channels
-        )(conditioning)
+
+        # The readout can be computed in lower precision, eg. bfloat16.
+        with utils.compute_params_in_dtype(self.readout_dtype):
+            coeffs = e3nn.haiku.Linear(
+                irreps_out=self.s2_irreps, channel_out=self.num_channels
+            )(conditioning.astype(self.readout_dtype))
+        coeffs = coeffs.astype(jnp.float32)
         assert coeffs.shape == (self.num_channels, (self.max_ell + 1) ** 2)
 
         return coeffs
@@ -89,7 +97,6 @@ class LinearAngularPredictor(AngularPredictor):
             coeffs, self.res_beta, self.res_alpha, self.quadrature
         )
         assert prob_signal.shape == (
-            self.num_channels,
             self.res_beta,
             self.res_alpha,
         )
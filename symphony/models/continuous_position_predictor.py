@@ -34,12 +34,14 @@ class TargetPositionPredictor(hk.Module):
         graphs: datatypes.Fragments,
         focus_node_indices: jnp.ndarray,
         target_species: jnp.ndarray,
+        node_embeddings: Optional[e3nn.IrrepsArray] = None,
     ) -> e3nn.IrrepsArray:
         """Computes the conditioning for the target position predictor."""
         num_graphs = graphs.n_node.shape[0]
 
-        # Compute the focus node embeddings.
-        node_embeddings = self.node_embedder(graphs)
+        # Compute the focus node embeddings, if not already computed.
+        if node_embeddings is None:
+            node_embeddings = self.node_embedder(graphs)
         focus_node_embeddings = node_embeddings[focus_node_indices]
 
         assert focus_node_embeddings.shape == (
@@ -73,6 +75,7 @@ class TargetPositionPredictor(hk.Module):
     def get_training_predictions(
         self,
         graphs: datatypes.Fragments,
+        node_embeddings: Optional[e3nn.IrrepsArray] = None,
     ) -> Tuple[e3nn.IrrepsArray, e3nn.SphericalSignal]:
         num_graphs, num_targets, _ = graphs.globals.target_positions.shape
 
@@ -82,7 +85,7 @@ class TargetPositionPredictor(hk.Module):
         # Compute the conditioning based on the focus nodes and target species.
         target_species = graphs.globals.target_species
         conditioning = self.compute_conditioning(
-            graphs, focus_node_indices, target_species
+            graphs, focus_node_indices, target_species, node_embeddings
         )
 
         target_positions = graphs.globals.target_positions
@@ -124,11 +127,14 @@ class TargetPositionPredictor(hk.Module):
         focus_indices: jnp.ndarray,
         target_species: jnp.ndarray,
         inverse_temperature: float,
+        node_embeddings: Optional[e3nn.IrrepsArray] = None,
     ) -> e3nn.IrrepsArray:
         num_graphs = graphs.n_node.shape[0]
 
         # Compute the conditioning based on the focus nodes and target species.
-        conditioning = self.compute_conditioning(graphs, focus_indices, target_species)
+        conditioning = self.compute_conditioning(
+            graphs, focus_indices, target_species, node_embeddings
+        )
         assert conditioning.shape == (num_graphs, conditioning.irreps.dim)
 
         # Sample the radial component.
@@ -117,6 +117,7 @@ class E3SchNet(hk.Module):
         max_ell: int,
         num_species: int,
         periodic_table_embedding: bool,
+        scan_interactions: bool = False,
         name: Optional[str] = None,
     ):
         """
@@ -129,6 +130,8 @@ class E3SchNet(hk.Module):
             cutoff: cutoff radius
             max_ell: maximal ell for spherical harmonics
             num_species: number of species
+            scan_interactions: whether to stack the interaction blocks with hk.layer_stack,
+                which compiles a single block instead of unrolling all of them
         """
         super().__init__(name=name)
         self.init_embedding_dim = init_embedding_dim
@@ -148,6 +151,7 @@ class E3SchNet(hk.Module):
         self.max_ell = max_ell
         self.num_species = num_species
         self.periodic_table_embedding = periodic_table_embedding
+        self.scan_interactions = scan_interactions
         self.ptable = PeriodicTable()
 
     def __call__(self, fragments: datatypes.Fragments) -> jnp.ndarray:
@@ -172,9 +176,9 @@ class E3SchNet(hk.Module):
         # Initially, the atom embeddings are just scalars.
         if self.periodic_table_embedding:
             x_species = hk.Embed(self.num_species, self.init_embedding_dim)(species)
-            x_group = hk.Embed(18, self.init_embedding_dim)(jax.vmap(lambda s: self.ptable.get_group(s))(species))
-            x_row = hk.Embed(7, self.init_embedding_dim)(jax.vmap(lambda s: self.ptable.get_row(s))(species))
-            x_block = hk.Embed(4, self.init_embedding_dim)(jax.vmap(lambda s: self.ptable.get_block(s))(species))
+            x_group = hk.Embed(18, self.init_embedding_dim)(self.ptable.get_group(species))
+            x_row = hk.Embed(7, self.init_embedding_dim)(self.ptable.get_row(species))
+            x_block = hk.Embed(4, self.init_embedding_dim)(self.ptable.get_block(species))
             x = jnp.concatenate([x_species, x_group, x_row, x_block], axis=-1)  # TODO: what's the best way to combine these things?
         else:
             x = hk.Embed(self.num_species, self.init_embedding_dim)(species)
@@ -197,11 +201,18 @@ class E3SchNet(hk.Module):
         Yr_ij = Yr_ij.reshape((Yr_ij.shape[0], 1, Yr_ij.shape[1]))
 
         # Compute interaction block to update atomic embeddings
-        for _ in range(self.num_interactions):
+        def interaction(x: e3nn.IrrepsArray) -> e3nn.IrrepsArray:
             v = E3SchNetInteractionBlock(
                 self.num_filters, self.max_ell, self.activation
             )(x, idx_i, idx_j, f_ij, rcut_ij, Yr_ij)
-            x = x + v
+            return x + v
+
+        if self.scan_interactions:
+            # Note that this stacks the parameters of all blocks along a new leading axis.
+            x = hk.layer_stack(self.num_interactions)(interaction)(x)
+        else:
+            for _ in range(self.num_interactions):
+                x = interaction(x)
         # In SchNetPack, the output is only the scalar features.
         # Here, we return the entire IrrepsArray.
         return x
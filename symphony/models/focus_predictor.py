@@ -28,12 +28,16 @@ class FocusAndTargetSpeciesPredictor(hk.Module):
         self.num_species = num_species
 
     def __call__(
-        self, graphs: datatypes.Fragments, inverse_temperature: float = 1.0
+        self,
+        graphs: datatypes.Fragments,
+        inverse_temperature: float = 1.0,
+        node_embeddings: Optional[e3nn.IrrepsArray] = None,
     ) -> Tuple[jnp.ndarray, jnp.ndarray]:
         num_graphs = graphs.n_node.shape[0]
 
-        # Get the node embeddings.
-        node_embeddings = self.node_embedder(graphs)
+        # Get the node embeddings, if not already computed.
+        if node_embeddings is None:
+            node_embeddings = self.node_embedder(graphs)
 
         num_nodes, _ = node_embeddings.shape
         node_embeddings = node_embeddings.filter(keep="0e")
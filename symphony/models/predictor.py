@@ -34,26 +34,34 @@ class Predictor(hk.Module):
         num_species = self.focus_and_target_species_predictor.num_species
         segment_ids = utils.get_segment_ids(graphs.n_node, num_nodes)
 
+        # Get the focus node indices.
+        focus_node_indices = utils.get_first_node_indices(graphs)
+
+        # Compute the node embeddings once, and share them with the predictors.
+        embeddings_for_focus = self.focus_and_target_species_predictor.node_embedder(
+            graphs
+        )
+        embeddings_for_positions = self.target_position_predictor.node_embedder(graphs)
+
         # Get the species and stop logits.
         (
             focus_and_target_species_logits,
             stop_logits,
-        ) = self.focus_and_target_species_predictor(graphs)
+        ) = self.focus_and_target_species_predictor(
+            graphs, node_embeddings=embeddings_for_focus
+        )
 
         # Get the species and stop probabilities.
         focus_and_target_species_probs, stop_probs = utils.segment_softmax_2D_with_stop(
             focus_and_target_species_logits, stop_logits, segment_ids, num_graphs
         )
 
-        # Get the focus node indices.
-        focus_node_indices = utils.get_first_node_indices(graphs)
-
         # Get the logits at the target positions.
         (
             radial_logits,
             angular_logits,
         ) = self.target_position_predictor.get_training_predictions(
-            graphs,
+            graphs, embeddings_for_positions
         )
 
         # Check the shapes.
@@ -78,12 +86,8 @@ class Predictor(hk.Module):
             nodes=datatypes.NodePredictions(
                 focus_and_target_species_logits=focus_and_target_species_logits,
                 focus_and_target_species_probs=focus_and_target_species_probs,
-                embeddings_for_focus=self.focus_and_target_species_predictor.node_embedder(
-                    graphs
-                ),
-                embeddings_for_positions=self.target_position_predictor.node_embedder(
-                    graphs
-                ),
+                embeddings_for_focus=embeddings_for_focus,
+                embeddings_for_positions=embeddings_for_positions,
             ),
             edges=None,
             globals=datatypes.GlobalPredictions(
@@ -115,12 +119,20 @@ class Predictor(hk.Module):
         num_species = self.focus_and_target_species_predictor.num_species
         segment_ids = utils.get_segment_ids(graphs.n_node, num_nodes)
 
+        # Compute the node embeddings once, and share them with the predictors.
+        embeddings_for_focus = self.focus_and_target_species_predictor.node_embedder(
+            graphs
+        )
+        embeddings_for_positions = self.target_position_predictor.node_embedder(graphs)
+
         # Get the species and stop logits.
         (
             focus_and_target_species_logits,
             stop_logits,
         ) = self.focus_and_target_species_predictor(
-            graphs, inverse_temperature=focus_and_atom_type_inverse_temperature
+            graphs,
+            inverse_temperature=focus_and_atom_type_inverse_temperature,
+            node_embeddings=embeddings_for_focus,
         )
 
         # Get the softmaxed probabilities.
@@ -128,11 +140,10 @@ class Predictor(hk.Module):
             focus_and_target_species_logits, stop_logits, segment_ids, num_graphs
         )
 
-        # Get the PRNG key for sampling.
-        rng = hk.next_rng_key()
+        # Get the PRNG keys for sampling.
+        stop_rng, focus_rng = jax.random.split(hk.next_rng_key())
 
         # We stop a graph, if we sample a stop.
-        rng, stop_rng = jax.random.split(rng)
         stop = jax.random.bernoulli(stop_rng, stop_probs)
 
         # Renormalize the focus and target species probabilities, if we have not stopped.
@@ -141,9 +152,10 @@ class Predictor(hk.Module):
         )
 
         # Sample the focus node and target species.
-        rng, focus_rng = jax.random.split(rng)
-        focus_indices, target_species = utils.segment_sample_2D(
-            focus_and_target_species_probs, segment_ids, num_graphs, focus_rng
+        # The logits differ from the log-probabilities only by a constant per graph,
+        # so we can sample from them directly, conditioned on not stopping.
+        focus_indices, target_species = utils.segment_sample_2D_from_logits(
+            focus_and_target_species_logits, segment_ids, num_graphs, focus_rng
         )
 
         # Compute the position coefficients.
@@ -152,6 +164,7 @@ class Predictor(hk.Module):
             focus_indices,
             target_species,
             position_inverse_temperature,
+            embeddings_for_positions,
         )
 
         assert stop.shape == (num_graphs,)
@@ -170,12 +183,8 @@ class Predictor(hk.Module):
             nodes=datatypes.NodePredictions(
                 focus_and_target_species_logits=focus_and_target_species_logits,
                 focus_and_target_species_probs=focus_and_target_species_probs,
-                embeddings_for_focus=self.focus_and_target_species_predictor.node_embedder(
-                    graphs
-                ),
-                embeddings_for_positions=self.target_position_predictor.node_embedder(
-                    graphs
-                ),
+                embeddings_for_focus=embeddings_for_focus,
+                embeddings_for_positions=embeddings_for_positions,
             ),
             edges=None,
             globals=datatypes.GlobalPredictions(
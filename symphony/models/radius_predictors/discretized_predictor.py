@@ -1,5 +1,6 @@
 import haiku as hk
 import jax.numpy as jnp
+import numpy as np
 import e3nn_jax as e3nn
 import distrax
 
@@ -25,8 +26,9 @@ class DiscretizedRadialPredictor(RadiusPredictor):
         self.num_layers = num_layers
         self.latent_size = latent_size
 
-    def radii(self) -> jnp.ndarray:
-        return jnp.linspace(self.range_min, self.range_max, self.num_bins)
+    def radii(self) -> np.ndarray:
+        # A NumPy constant, so that it is embedded into the traced computation.
+        return np.linspace(self.range_min, self.range_max, self.num_bins)
 
     def predict_logits(self, conditioning: e3nn.IrrepsArray) -> distrax.Bijector:
         """Predicts the logits."""
@@ -51,7 +53,7 @@ class DiscretizedRadialPredictor(RadiusPredictor):
     ) -> jnp.ndarray:
         """Computes the log probability of the given samples."""
         radii = jnp.linalg.norm(samples.array, axis=-1)
-        indices = jnp.argmin(jnp.abs(radii - self.radii()))
+        indices = jnp.argmin(jnp.abs(radii[..., None] - self.radii()), axis=-1)
         dist = self.create_distribution(conditioning)
         return dist.log_prob(indices)
 
@@ -60,4 +62,4 @@ class DiscretizedRadialPredictor(RadiusPredictor):
         dist = self.create_distribution(conditioning)
         rng = hk.next_rng_key()
         indices = dist.sample(seed=rng, sample_shape=conditioning.shape[:-1])
-        return self.radii()[indices]
+        return jnp.asarray(self.radii())[indices]
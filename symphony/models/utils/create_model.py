@@ -126,6 +126,7 @@ def create_node_embedder(
             max_ell=config.max_ell,
             num_species=num_species,
             periodic_table_embedding=config.periodic_table_embedding,
+            scan_interactions=config.get("scan_interactions", False),
         )
 
     if config.model == "Allegro":
@@ -180,6 +181,7 @@ def create_predictor(config: ml_collections.ConfigDict) -> Predictor:
         sampling_inverse_temperature_factor=angular_predictor_config.sampling_inverse_temperature_factor,
         sampling_num_steps=angular_predictor_config.sampling_num_steps,
         sampling_init_step_size=angular_predictor_config.sampling_init_step_size,
+        readout_dtype=angular_predictor_config.get("readout_dtype", "float32"),
     )
     if config.target_position_predictor.radial_predictor_type == "rational_quadratic_spline":
         radial_predictor_fn = lambda: RationalQuadraticSplineRadialPredictor(
@@ -1,9 +1,11 @@
 """Definition of the generative models."""
 
-from typing import Tuple
+import contextlib
+from typing import Iterator, Tuple
 
 import chex
 import e3nn_jax as e3nn
+import haiku as hk
 import jax
 import jax.numpy as jnp
 import jraph
@@ -16,9 +18,25 @@ def get_atomic_numbers(
     return jnp.asarray(atomic_numbers)[species]
 
 
+@contextlib.contextmanager
+def compute_params_in_dtype(dtype: jnp.dtype) -> Iterator[None]:
+    """Within this context, parameters are stored in float32 but cast to dtype when used."""
+
+    def create_in_float32(next_creator, shape, param_dtype, init, context):
+        del param_dtype, context
+        return next_creator(shape, jnp.float32, init)
+
+    def cast_to_dtype(next_getter, value, context):
+        del context
+        return next_getter(value).astype(dtype)
+
+    with hk.custom_creator(create_in_float32), hk.custom_getter(cast_to_dtype):
+        yield
+
+
 def get_first_node_indices(graphs: jraph.GraphsTuple) -> jnp.ndarray:
     """Returns the indices of the focus nodes in each graph."""
-    return jnp.concatenate((jnp.asarray([0]), jnp.cumsum(graphs.n_node)[:-1]))
+    return jnp.cumsum(graphs.n_node) - graphs.n_node
 
 
 def segment_softmax_2D_with_stop(
@@ -59,63 +77,77 @@ def get_segment_ids(
     """Returns the segment ids for each node in the graphs."""
     num_graphs = n_node.shape[0]
 
-    return jnp.repeat(
-        jnp.arange(num_graphs), n_node, axis=0, total_repeat_length=num_nodes
+    # Find the graph of each node by searching the node index in the cumulative sum.
+    # Any nodes beyond the total count are assigned to the last graph.
+    segment_ids = jnp.searchsorted(
+        jnp.cumsum(n_node), jnp.arange(num_nodes), side="right"
     )
+    return jnp.minimum(segment_ids, num_graphs - 1)
 
 
-def segment_sample_2D(
-    species_probabilities: jnp.ndarray,
+def segment_sample_2D_from_logits(
+    species_logits: jnp.ndarray,
     segment_ids: jnp.ndarray,
     num_segments: int,
     rng: chex.PRNGKey,
 ) -> Tuple[jnp.ndarray, jnp.ndarray]:
-    """Sample indices from a categorical distribution across each segment.
+    """Sample indices from a categorical distribution across each segment, given unnormalized logits.
     Args:
-        species_probabilities: A 2D array of probabilities.
+        species_logits: A 2D array of logits, possibly shifted by a constant per segment.
         segment_ids: A 1D array of segment ids.
         num_segments: The number of segments.
         rng: A PRNG key.
     Returns:
         A 1D array of sampled indices, one for each segment.
     """
-    num_nodes, num_species = species_probabilities.shape
-
-    # Normalize the probabilities to sum up for 1 over all nodes in each graph.
-    species_probabilities_summed = jraph.segment_sum(
-        species_probabilities.sum(axis=-1), segment_ids, num_segments
-    )
-    species_probabilities = (
-        species_probabilities / species_probabilities_summed[segment_ids, None]
+    num_nodes, num_species = species_logits.shape
+
+    # Gumbel-max trick: the argmax of the perturbed logits over all
+    # (node, species) pairs in a segment is a sample from the joint distribution.
+    # This holds without normalizing the logits within each segment.
+    gumbels = jax.random.gumbel(rng, (num_nodes, num_species))
+    perturbed_logits = species_logits + gumbels
+
+    # Pick the best species for each node, then the best node for each segment.
+    species_argmax = jnp.argmax(perturbed_logits, axis=-1)
+    node_max = jnp.max(perturbed_logits, axis=-1)
+    segment_max = jraph.segment_max(node_max, segment_ids, num_segments)
+    node_indices = jraph.segment_min(
+        jnp.where(
+            node_max == segment_max[segment_ids], jnp.arange(num_nodes), num_nodes
+        ),
+        segment_ids,
+        num_segments,
     )
+    # Empty segments (eg. padding graphs) have no nodes to sample from.
+    node_indices = jnp.minimum(node_indices, num_nodes - 1)
+    species_indices = species_argmax[node_indices]
 
-    def sample_for_segment(rng: chex.PRNGKey, segment_id: int) -> Tuple[float, float]:
-        """Samples a node and species index for a single segment."""
-        node_rng, logit_rng, rng = jax.random.split(rng, num=3)
-        node_index = jax.random.choice(
-            node_rng,
-            jnp.arange(num_nodes),
-            p=jnp.where(
-                segment_id == segment_ids, species_probabilities.sum(axis=-1), 0.0
-            ),
-        )
-        normalized_probs_for_index = species_probabilities[node_index] / jnp.sum(
-            species_probabilities[node_index]
-        )
-        species_index = jax.random.choice(
-            logit_rng, jnp.arange(num_species), p=normalized_probs_for_index
-        )
-        return node_index, species_index
-
-    rngs = jax.random.split(rng, num_segments)
-    node_indices, species_indices = jax.vmap(sample_for_segment)(
-        rngs, jnp.arange(num_segments)
-    )
     assert node_indices.shape == (num_segments,)
     assert species_indices.shape == (num_segments,)
     return node_indices, species_indices
 
 
+def segment_sample_2D(
+    species_probabilities: jnp.ndarray,
+    segment_ids: jnp.ndarray,
+    num_segments: int,
+    rng: chex.PRNGKey,
+) -> Tuple[jnp.ndarray, jnp.ndarray]:
+    """Sample indices from a categorical distribution across each segment.
+    Args:
+        species_probabilities: A 2D array of probabilities.
+        segment_ids: A 1D array of segment ids.
+        num_segments: The number of segments.
+        rng: A PRNG key.
+    Returns:
+        A 1D array of sampled indices, one for each segment.
+    """
+    return segment_sample_2D_from_logits(
+        jnp.log(species_probabilities), segment_ids, num_segments, rng
+    )
+
+
 def log_coeffs_to_logits(
     log_coeffs: e3nn.IrrepsArray, res_beta: int, res_alpha: int, num_radii: int
 ) -> e3nn.SphericalSignal:
@@ -228,15 +260,14 @@ def compute_coefficients_of_logits_of_joint_distribution(
     log_angular_coeffs: e3nn.IrrepsArray,
 ) -> e3nn.IrrepsArray:
     """Combines radial weights and angular coefficients to get a distribution on the spheres."""
+    num_radii = radial_logits.shape[0]
     radial_logits = e3nn.IrrepsArray("0e", radial_logits[:, None])
-    log_dist_coeffs = jax.vmap(
-        lambda log_radial_weight: e3nn.concatenate(
-            [log_radial_weight, log_angular_coeffs]
-        )
-    )(radial_logits)
+    log_angular_coeffs = log_angular_coeffs.broadcast_to(
+        (num_radii, log_angular_coeffs.irreps.dim)
+    )
+    log_dist_coeffs = e3nn.concatenate([radial_logits, log_angular_coeffs], axis=-1)
     log_dist_coeffs = e3nn.sum(log_dist_coeffs.regroup(), axis=-1)
 
-    num_radii = radial_logits.shape[0]
     assert log_dist_coeffs.shape == (num_radii, log_dist_coeffs.irreps.dim)
 
     return log_dist_coeffs
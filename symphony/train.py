@@ -268,7 +268,7 @@ def train_and_evaluate(
     # Save the config for reproducibility.
     config_path = os.path.join(workdir, "config.yml")
     with open(config_path, "w") as f:
-        yaml.dump(config, f)
+        yaml.safe_dump(config.to_dict(), f)
 
     # Get datasets, organized by split.
     logging.info("Obtaining datasets.")
@@ -0,0 +1,37 @@
+"""Tests for the analysis utilities."""
+
+from absl.testing import absltest
+from absl.testing import parameterized
+import jax
+
+from analyses import analysis
+from symphony import models
+
+from configs import root_dirs
+from configs.qm9 import e3schnet as qm9_e3schnet
+from configs.qm9 import nequip as qm9_nequip
+
+_ALL_CONFIGS = {
+    "qm9_e3schnet": qm9_e3schnet.get_config(),
+    "qm9_nequip": qm9_nequip.get_config(),
+}
+
+
+class AnalysisTest(parameterized.TestCase):
+    @parameterized.parameters("qm9_e3schnet", "qm9_nequip")
+    def test_init_with_dummy_graphs(self, config_name: str):
+        """Checks that the model can be initialized with the dummy graphs from load_from_workdir()."""
+        config = _ALL_CONFIGS[config_name]
+        config.root_dir = root_dirs.get_root_dir(config.dataset)
+        model = models.create_model(config, run_in_evaluation_mode=False)
+
+        params_shapes = jax.eval_shape(
+            model.init,
+            jax.random.PRNGKey(config.rng_seed),
+            analysis._make_dummy_init_graphs(config),
+        )
+        self.assertNotEmpty(jax.tree_util.tree_leaves(params_shapes))
+
+
+if __name__ == "__main__":
+    absltest.main()
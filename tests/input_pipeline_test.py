@@ -1,3 +1,22 @@
 """Tests for the input pipeline."""
 
-# TODO: ameyad
+from absl.testing import absltest
+from absl.testing import parameterized
+
+from symphony.data import input_pipeline
+
+
+class InputPipelineTest(parameterized.TestCase):
+    @parameterized.parameters(
+        (480, 1440, 16, (480, 1472, 16)),
+        (481, 1441, 16, (488, 1472, 16)),
+        (1, 1, 2, (8, 64, 2)),
+    )
+    def test_bucket_padding_budget(self, n_node, n_edge, n_graph, expected):
+        self.assertEqual(
+            input_pipeline.bucket_padding_budget(n_node, n_edge, n_graph), expected
+        )
+
+
+if __name__ == "__main__":
+    absltest.main()
@@ -17,6 +17,20 @@ class ModelsTest(parameterized.TestCase):
     def setUp(self):
         super().setUp()
 
+    @parameterized.parameters(
+        ([2, 3], 5),
+        ([2, 0, 3], 5),
+        ([2, 3, 1], 8),
+    )
+    def test_get_segment_ids(self, n_node, num_nodes):
+        n_node = jnp.asarray(n_node)
+        expected = jnp.repeat(
+            jnp.arange(len(n_node)), n_node, total_repeat_length=num_nodes
+        )
+        np.testing.assert_array_equal(
+            models.get_segment_ids(n_node, num_nodes), expected
+        )
+
     def test_segment_sample_2D(self):
         species_probs = jnp.asarray(
             [